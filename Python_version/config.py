@@ -12,120 +12,215 @@ is implemented.
 @author: Alexis Bottero (alexis.bottero@gmail.com)
 """
 
-from __future__ import (absolute_import, division, print_function)
-
 import argparse
-try:
-    # Python 3
-    from configparser import ConfigParser
-except ImportError:
-    # Python 2
-    from ConfigParser import SafeConfigParser
+import functools
+import math
+import os
+import re
 
 import numpy as np
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 import gll
 
 
-class FakeGlobalSectionHead(object):
-    def __init__(self, fp):
-        self.fp = fp
-        self.sechead = '[global]\n'
+# "KEY = value" line of a Par_file
+PAR_LINE = re.compile(r'^\s*([A-Za-z_]\w*)\s*[=:]\s*(.*?)\s*$')
+# Reference to the value of another parameter, e.g. %(N)s
+PAR_REFERENCE = re.compile(r'%\((\w+)\)s')
+MAX_INTERPOLATION_DEPTH = 10
 
-    def readline(self):
-        if self.sechead:
-            try:
-                return self.sechead
-            finally:
-                self.sechead = None
-        else:
-            return self.fp.readline()
+BOOLEANS = {'1': True, 'yes': True, 'true': True, 'on': True,
+            '0': False, 'no': False, 'false': False, 'off': False}
+
+
+def to_boolean(value):
+    """Converts a Par_file value (or an already typed value) to a boolean"""
+    if not isinstance(value, str):
+        return bool(value)
+    try:
+        return BOOLEANS[value.strip().lower()]
+    except KeyError:
+        raise ValueError('Not a boolean: %s' % (value, ))
+
+
+def to_integer(value):
+    """Converts a Par_file value (or an already typed value) to an integer,
+    refusing numbers with a fractional part"""
+    if isinstance(value, str):
+        return int(value)
+    if value != int(value):
+        raise ValueError('Not an integer: %s' % (value, ))
+    return int(value)
+
+
+def to_string(value):
+    """Converts a Par_file value to a string, removing its quotes"""
+    return str(value).strip("'\"")
+
+
+# Parameters read from the Par_file:
+# (attribute of Parameter, Par_file key, type, default value)
+PARAMETERS = [
+    # True if axial symmetry
+    ('axisym', 'AXISYM', to_boolean, True),
+    # Boundary's type
+    ('boundType', 'BOUND_TYPE', to_string, 'NONE'),
+    # "Physical" length of the domain (in meters)
+    ('length', 'LENGTH', float, 3000),
+    # Number of elements
+    ('nSpec', 'NSPEC', to_integer, 250),
+    # Degree of the basis functions
+    ('N', 'N', to_integer, 4),
+    # Degree of basis functions in the first element
+    ('NGLJ', 'NGLJ', to_integer, 4),
+    # Number of time steps
+    ('nts', 'NTS', to_integer, 2),
+    # Courant CFL number
+    ('cfl', 'CFL', float, 0.45),
+    # Grid description
+    ('gridType', 'GRID_TYPE', to_string, 'homogeneous'),
+    ('gridFile', 'GRID_FILE', to_string, 'grid_homogeneous.txt'),
+    ('ticksFile', 'TICKS_FILE', to_string, 'ticks_homogeneous.txt'),
+    # kg/m^3
+    ('meanRho', 'DENSITY', float, 2500),
+    # Pa
+    ('meanMu', 'RIGIDITY', float, 30000000000),
+    # Duration of the source in dt
+    ('tSource', 'TSOURCE', float, 100),
+    # GLL point number on which the source is situated
+    ('iSource', 'ISOURCE', to_integer, 0),
+    # Maximum amplitude
+    ('maxAmpl', 'MAX_AMPL', float, 1e7),
+    # Source's type
+    ('sourceType', 'SOURCE_TYPE', to_string, 'ricker'),
+    # Decay rate for the ricker
+    ('decayRate', 'DECAY_RATE', float, 2.628),
+    # Time steps between snapshots (0 == disabled)
+    ('snapshot', 'SNAPSHOT', to_integer, 0),
+    # Plot grid, source, and periodic results
+    ('plot', 'PLOT', to_boolean, False),
+    # One image is displayed each DPLOT time step
+    ('dplot', 'DPLOT', float, 10),
+    # Floating point precision of the simulation: 'single' or 'double'
+    ('precision', 'PRECISION', to_string, 'double'),
+]
+
+DEFAULTS = dict((key, default) for _, key, _, default in PARAMETERS)
+# Lower-cased Par_file keys, as returned by read_par_file
+PARAMETER_KEYS = set(key.lower() for key in DEFAULTS)
+
+# Floating point type associated with each PRECISION
+DTYPES = {'single': np.float32, 'double': np.float64}
+
+
+def read_par_file(filename, defaults=DEFAULTS):
+    """Reads a Par_file made of "KEY = value" lines, blank lines and
+    comments starting with '#' or ';'. Returns a dict mapping the lower-cased
+    keys to their (string) values, missing keys being taken from defaults.
+    A value may refer to another parameter as %(KEY)s: references are left
+    as they are, see resolve_references"""
+    raw = dict((key.lower(), str(value)) for key, value in defaults.items())
+    with open(filename) as f:
+        for number, line in enumerate(f, 1):
+            stripped = line.strip()
+            if not stripped or stripped[0] in '#;':
+                continue
+            match = PAR_LINE.match(line)
+            if match is None:
+                raise ValueError('%s, line %d: cannot parse %r' %
+                                 (filename, number, stripped))
+            raw[match.group(1).lower()] = match.group(2)
+    return raw
+
+
+def resolve_references(par):
+    """Returns a copy of par (as returned by read_par_file) in which the
+    %(KEY)s references of the string values are replaced by the value of
+    the parameter KEY"""
+
+    def resolve(key, depth):
+        value = par[key]
+        if not isinstance(value, str):
+            return str(value)
+        if depth > MAX_INTERPOLATION_DEPTH:
+            raise ValueError('Too many levels of interpolation for %s' %
+                             (key, ))
 
+        def replace(match):
+            reference = match.group(1).lower()
+            if reference not in par:
+                raise ValueError('%s refers to unknown parameter %s' %
+                                 (key, match.group(1)))
+            return resolve(reference, depth + 1)
 
-class Parameter(object):
+        return PAR_REFERENCE.sub(replace, value)
+
+    return dict((key, resolve(key, 0) if isinstance(value, str) else value)
+                for key, value in par.items())
+
+
+@functools.lru_cache(maxsize=8)
+def cached_par_file(path, mtime_ns, size, inode):
+    """read_par_file(path), cached on the file state given by os.stat (see
+    load_par_file). The result must not be modified"""
+    return read_par_file(path)
+
+
+def load_par_file(filename):
+    """Same as read_par_file with the default values, but the file is only
+    parsed again if it has changed (modification time, size or inode) since
+    the last call"""
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    return dict(cached_par_file(path, stat.st_mtime_ns, stat.st_size,
+                                stat.st_ino))
+
+
+@functools.lru_cache(maxsize=8)
+def global_index(nSpec, nGLL):
+    """Returns the global index matrix of nSpec elements of nGLL points (see
+    Parameter.make_global_index). The result is cached and must not be
+    modified"""
+    # TODO: add GLJ
+    elements = np.arange(nSpec, dtype=np.intp)[:, np.newaxis]
+    ibool = (nGLL - 1) * elements + np.arange(nGLL, dtype=np.intp)
+    return gll.read_only(ibool)
+
+
+class Parameter:
     """Contains all the constants and parameters necessary for 1D spectral
     element simulation"""
 
-    def __init__(self):
-        """Init"""
-        cp = ConfigParser(defaults={
-            # True if axial symmetry
-            'axisym': True,
-            # Boundary's type
-            'BOUND_TYPE':'NONE',
-            # "Physical" length of the domain (in meters)
-            'LENGTH': 3000,
-            # Number of elements
-            'NSPEC': 250,
-            # Degree of the basis functions
-            'N': 4,
-            # Degree of basis functions in the first element
-            'NGLJ': 4,
-            # Number of time steps
-            'NTS': 2,
-            # Courant CFL number
-            'CFL': 0.45,
-            # Grid description
-            'GRID_TYPE': 'homogeneous',
-            'GRID_FILE': 'grid_homogeneous.txt',
-            'TICKS_FILE': 'ticks_homogeneous.txt',
-            # kg/m^3
-            'DENSITY': 2500,
-            # Pa
-            'RIGIDITY': 30000000000,
-            # Duration of the source in dt
-            'TSOURCE': 100,
-            # GLL point number on which the source is situated
-            'ISOURCE': 0,
-            # Maximum amplitude
-            'MAX_AMPL': 1e7,
-            # Source's type
-            'SOURCE_TYPE': 'ricker',
-            # Decay rate for the ricker
-            'DECAY_RATE': 2.628,
-            # Time steps between snapshots (0 == disabled)
-            'SNAPSHOT': 0,
-            # Plot grid, source, and periodic results
-            'PLOT': False,
-            # One image is displayed each DPLOT time step
-            'DPLOT': 10,
-        })
-        with open('Par_file') as f:
-            try:
-                # Python 3
-                cp.read_string('[global]\n' + f.read(), source='Par_file')
-            except AttributeError:
-                # Python 2
-                cp.readfp(FakeGlobalSectionHead(f))
-
-        self.axisym = cp.getboolean('global', 'AXISYM')
-        self.boundType = cp.get('global','BOUND_TYPE').strip("'\"")
-        self.length = cp.getfloat('global', 'LENGTH')
-        self.nSpec = cp.getint('global', 'NSPEC')
-        self.N = cp.getint('global', 'N')
-        self.NGLJ = cp.getint('global', 'NGLJ')
-        self.nts = cp.getint('global', 'NTS')
-        self.cfl = cp.getfloat('global', 'CFL')
-        self.gridType = cp.get('global', 'GRID_TYPE').strip("'\"")
-        self.gridFile = cp.get('global', 'GRID_FILE').strip("'\"")
-        self.ticksFile = cp.get('global', 'TICKS_FILE').strip("'\"")
-        self.meanRho = cp.getfloat('global', 'DENSITY')
-        self.meanMu = cp.getfloat('global', 'RIGIDITY')
-        self.tSource = cp.getfloat('global', 'TSOURCE')
-        self.iSource = cp.getint('global', 'ISOURCE')
-        self.maxAmpl = cp.getfloat('global', 'MAX_AMPL')
-        self.sourceType = cp.get('global', 'SOURCE_TYPE').strip("'\"")
-        self.decayRate = cp.getfloat('global', 'DECAY_RATE')
-        self.snapshot = cp.getint('global', 'SNAPSHOT')
-        self.plot = cp.getboolean('global', 'PLOT')
-        self.dplot = cp.getfloat('global', 'DPLOT')
-
-        parser = argparse.ArgumentParser(
-            description='Spectral element method in a 1D medium')
-        parser.add_argument('--no-plot', action='store_true',
-                            help='Force disable plotting')
-        args = parser.parse_args()
-        self.plot = self.plot and not args.no_plot
+    def __init__(self, par=None):
+        """Init. The parameters are read from the Par_file and the command
+        line, unless par, a dict as returned by read_par_file, is given (see
+        from_dict)"""
+        from_file = par is None
+        if from_file:
+            par = load_par_file('Par_file')
+        par = resolve_references(par)
+
+        for attribute, key, convert, _ in PARAMETERS:
+            setattr(self, attribute, convert(par[key.lower()]))
+
+        if from_file:
+            parser = argparse.ArgumentParser(
+                description='Spectral element method in a 1D medium')
+            parser.add_argument('--no-plot', action='store_true',
+                                help='Force disable plotting')
+            args = parser.parse_args()
+            self.plot = self.plot and not args.no_plot
+
+        try:
+            # Floating point type of the grid, the mass and stiffness matrices
+            # and the wavefield (u, vel, acc)
+            self.dtype = DTYPES[self.precision]
+        except KeyError:
+            raise ValueError('Unknown precision: %s' % (self.precision, ))
 
         # Number of GLL points per elements
         self.nGLL = self.N + 1
@@ -146,6 +241,8 @@ class Parameter(object):
             self.ksiGLL = gll.GLL_POINTS[self.N]
             # Integration weights
             self.wGLL = gll.GLL_WEIGHTS[self.N]
+            # Derivatives of the Lagrange polynomials at the GLL points
+            self.deriv = gll.GLL_DERIVATIVES[self.N]
         except KeyError:
             raise ValueError('N = %d is invalid!' % (self.N, ))
         try:
@@ -153,28 +250,53 @@ class Parameter(object):
             self.ksiGLJ = gll.GLJ_POINTS[self.NGLJ]
             # Integration weights
             self.wGLJ = gll.GLJ_WEIGHTS[self.NGLJ]
+            # Derivatives of the GLJ polynomials at the GLJ points
+            self.derivGLJ = gll.GLJ_DERIVATIVES[self.NGLJ]
         except KeyError:
             raise ValueError('NGLJ = %d is invalid!' % (self.NGLJ, ))
 
-        # Derivatives of the Lagrange polynomials at the GLL points
-        self.deriv = gll.lagrange_derivative(self.ksiGLL)
-        self.derivGLJ = gll.glj_derivative(self.ksiGLJ)
+    @classmethod
+    def from_dict(cls, values):
+        """Builds the parameters from a dict mapping Par_file keys (in any
+        case) to values, without reading any file nor the command line.
+        Values may be Par_file strings or already typed (e.g. NSPEC=10.0),
+        missing keys take their default value and unknown keys raise a
+        ValueError. References such as NGLJ = %(N)s are resolved after the
+        values are merged, so they follow the overrides. For instance, to
+        sweep over the CFL number:
+            base = read_par_file('Par_file')
+            for cfl in (0.3, 0.45):
+                param = Parameter.from_dict(dict(base, CFL=cfl))"""
+        par = dict((key.lower(), value) for key, value in DEFAULTS.items())
+        for key, value in values.items():
+            if key.lower() not in PARAMETER_KEYS:
+                raise ValueError('Unknown parameter: %s' % (key, ))
+            par[key.lower()] = value
+        return cls(par)
 
     def make_global_index(self):
         """Returns a matrix A. A[element_number,GLL_considered] -> index in the
         global array, if we work in axisym and that the element number is 0 the
         points are GLJ points"""
-        # TODO: add GLJ
-        ibool = np.zeros((self.nSpec, self.nGLL), dtype=np.intp)
-        for e in np.arange(self.nSpec):
-            for i in np.arange(self.nGLL):
-                ibool[e, i] = (self.nGLL - 1) * e + i
-        return ibool
+        return global_index(self.nSpec, self.nGLL)
 
 
-class Source(object):
+def ricker(t, hdur, factor, alpha2):
+    """Value of the ricker source at the scalar time t (see Source)"""
+    t -= hdur
+    return factor * t * math.exp(-alpha2 * t * t)
+
+
+if njit is not None:
+    ricker = njit(cache=True, fastmath=True)(ricker)
+
+
+class Source:
     """Contains the source properties"""
 
+    __slots__ = ('typeOfSource', 'ampl', 'hdur', 'decayRate', 'alpha',
+                 'factor', 'alpha2')
+
     def __init__(self, param):
         """Init"""
         self.typeOfSource = param.sourceType
@@ -183,14 +305,28 @@ class Source(object):
             self.hdur = param.tSource * param.dt  # Duration of the source (s)
             self.decayRate = param.decayRate
             self.alpha = self.decayRate / self.hdur
+            # Constant factor and exponent coefficient of the ricker
+            self.factor = -2 * self.ampl * self.alpha**3 / np.sqrt(np.pi)
+            self.alpha2 = self.alpha * self.alpha
         else:
             raise ValueError('Unknown source type: %s' % (self.typeOfSource, ))
 
     def __getitem__(self, t):
-        """What happens when we do source[t]"""
+        """What happens when we do source[t]. t may be a scalar or an array,
+        it is not modified"""
+        if np.ndim(t) == 0:
+            # Called once per time step: skip the array machinery
+            return ricker(float(t), self.hdur, self.factor, self.alpha2)
+        t = np.array(t, dtype=np.float64)
         t -= self.hdur
-        return -2 * self.ampl * self.alpha**3 / np.sqrt(np.pi) * (
-            t * np.exp(-(self.alpha * t)**2))
+        # Evaluated in place in a single buffer to avoid temporaries
+        out = np.empty_like(t)
+        np.multiply(t, t, out=out)
+        out *= -self.alpha2
+        np.exp(out, out=out)
+        out *= t
+        out *= self.factor
+        return out
 
     def plotSource(self):
         """Plot the source"""
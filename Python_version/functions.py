@@ -8,8 +8,6 @@ elements simulations.
 @author: Alexis Bottero (alexis.bottero@gmail.com)
 """
 
-from __future__ import (absolute_import, division, print_function)
-
 import numpy as np
 
 
@@ -23,21 +21,15 @@ def estimate_timestep(grid, param):
     return dt, dh
 
 
-def project_inverse(ksi, elt_number, ticks):
-    """From the abscissa of a point (ksi) onto the reference interval,
-       the number of the element to which it belongs (elt_number) and
-       the abscissa of the borders of the elements (ticks) returns
-       its abscissa onto the interval [zmin, zmax]"""
-    z0 = 1. / 2. * ((ksi + 1) * ticks[elt_number + 1] +
-                    (1 - ksi) * ticks[elt_number])
-    return z0
-
-
 def make_stiffness_matrix(grid, param):
     """Computation of stiffness matrices"""
-    Ke = np.zeros((param.nSpec, param.nGLL, param.nGLL))
+    Ke = np.zeros((param.nSpec, param.nGLL, param.nGLL), dtype=param.dtype)
+    axisym = param.axisym
+    zElem = grid.zElem
+    # Everything but the radius (in axisym) is known for all elements at once
+    tmp = grid.mu * grid.dKsiDx**2 * grid.dXdKsi
     for e in range(param.nSpec):
-        if param.axisym and e == 0:
+        if axisym and e == 0:
             gllj = param.wGLJ
             ngllj = param.nGLJ
             deriv = param.derivGLJ
@@ -46,14 +38,14 @@ def make_stiffness_matrix(grid, param):
             ngllj = param.nGLL
             deriv = param.deriv
 
-        tmpe = gllj * grid.mu[e, :] * grid.dKsiDx[e, :]**2 * grid.dXdKsi[e, :]
-        if param.axisym and e != 0:
-            tmpe *= project_inverse(param.ksiGLL, e, grid.ticks)
+        tmpe = gllj * tmp[e, :]
+        if axisym and e != 0:
+            tmpe *= zElem[e, :]
 
         for i in range(ngllj):
             tmpi = deriv[i, :] * tmpe
-            if param.axisym and e != 0:
-                tmpi /= project_inverse(param.ksiGLL[i], e, grid.ticks)
+            if axisym and e != 0:
+                tmpi /= zElem[e, i]
 
             Ke[e, i, :] = np.inner(tmpi, deriv)
 
@@ -62,7 +54,7 @@ def make_stiffness_matrix(grid, param):
 
 def make_mass_matrix(grid, param):
     """Computation of global mass matrix"""
-    M = np.zeros(param.nGlob)
+    M = np.zeros(param.nGlob, dtype=param.dtype)
     # NOTE: We cannot simply drop this outer loop because param.ibool contains
     # repeated indices into M and the addition would not work correctly if we
     # tried to slice it in.
@@ -3,8 +3,6 @@
 Functions for working with GLL points.
 """
 
-from __future__ import (absolute_import, division, print_function)
-
 import numpy as np
 
 
@@ -64,7 +62,7 @@ def lagrange_derivative(ksiGLL):
 
     for i in range(N + 1):
         # Exclude i since ksiGLL[i] - ksiGLL[i] is obviously 0.
-        prod1 = np.product(diffs[i, :i]) * np.product(diffs[i, i + 1:])
+        prod1 = np.prod(diffs[i, :i]) * np.prod(diffs[i, i + 1:])
         prod1 = 1 / prod1
 
         for j in range(N + 1):
@@ -76,17 +74,17 @@ def lagrange_derivative(ksiGLL):
 
             elif i < j:
                 # Just like prod1, but excluding i and j.
-                prod2 = (np.product(diffs[j, :i]) *
-                         np.product(diffs[j, i + 1:j]) *
-                         np.product(diffs[j, j + 1:]))
+                prod2 = (np.prod(diffs[j, :i]) *
+                         np.prod(diffs[j, i + 1:j]) *
+                         np.prod(diffs[j, j + 1:]))
 
                 deriv[i, j] = prod1 * prod2
 
             elif i > j:
                 # Just like prod1, but excluding j and i.
-                prod2 = (np.product(diffs[j, :j]) *
-                         np.product(diffs[j, j + 1:i]) *
-                         np.product(diffs[j, i + 1:]))
+                prod2 = (np.prod(diffs[j, :j]) *
+                         np.prod(diffs[j, j + 1:i]) *
+                         np.prod(diffs[j, i + 1:]))
 
                 deriv[i, j] = prod1 * prod2
 
@@ -137,23 +135,29 @@ def glj_derivative(ksiGLJ):
     return deriv
 
 
+def read_only(array):
+    """Marks array as read-only and returns it. Used for arrays that are
+    computed once and shared between callers: an accidental in-place change
+    then raises instead of silently affecting the others"""
+    array.setflags(write=False)
+    return array
+
+
+# Derivatives of the Lagrange polynomials at the GLL points, and of the GLJ
+# polynomials at the GLJ points, for each degree
+GLL_DERIVATIVES = dict((N, read_only(lagrange_derivative(ksi)))
+                       for N, ksi in GLL_POINTS.items())
+
+GLJ_DERIVATIVES = dict((N, read_only(glj_derivative(ksi)))
+                       for N, ksi in GLJ_POINTS.items())
+
+
 def jacobian(ticks, param):
     """Calculates the jacobian dx/dksi of the substitution on the GLL points
        (and GLJ points for the first element in axisymmetric).
        Returns a matrix nSpec*(N+1) containing its value for each element and
-       each points"""
+       each points, with the same dtype as ticks"""
     Np1 = len(param.ksiGLL)
     dE = np.diff(ticks) / 2
     dXdKsi = np.repeat(dE, Np1).reshape((-1, Np1))
     return dXdKsi
-
-
-def jacobian_inverse(ticks, param):
-    """Calculate the jacobian dksi/dx of the substitution on the GLL points
-       (and GLJ points for the first element in axisymmetric).
-       Returns a matrix nSpec*(N+1) containing its value for each element and
-       each points"""
-    Np1 = len(param.ksiGLL)
-    dE = 2 / np.diff(ticks)
-    dKsiDx = np.repeat(dE, Np1).reshape((-1, Np1))
-    return dKsiDx
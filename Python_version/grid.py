@@ -3,42 +3,47 @@
 Definitions of the grid.
 '''
 
-from __future__ import (absolute_import, division, print_function)
-
 import numpy as np
 
-import functions
 import gll
 
 
-class OneDimensionalGrid(object):
+def homogeneous_geometry(param):
+    """Returns the abscissas of the borders of the elements (ticks) and of
+    the points (z) of a homogeneous grid"""
+    ticks = np.linspace(0, param.length, param.nSpec + 1, dtype=param.dtype)
+    # Abscissa of the points of each element: middle + half width * ksi, as
+    # one outer product. The first element uses the GLJ points in axisym.
+    middle = (ticks[1:] + ticks[:-1]) / 2
+    halfWidth = np.diff(ticks) / 2
+    ksi = np.tile(param.ksiGLL, (param.nSpec, 1))
+    if param.axisym:
+        ksi[0, :] = param.ksiGLJ
+    zElem = middle[:, np.newaxis] + halfWidth[:, np.newaxis] * ksi
+    # Put the borders exactly on the ticks, as they are shared by
+    # neighbouring elements
+    zElem[:, 0] = ticks[:-1]
+    zElem[:, -1] = ticks[1:]
+    z = np.zeros(param.nGlob, dtype=param.dtype)
+    z[param.ibool] = zElem
+    return ticks, z
+
+
+class OneDimensionalGrid:
     """Contains the grid properties"""
 
     def __init__(self, param):
         """Init"""
         self.param = param
-        self.z = np.zeros(param.nGlob)
-        self.rho = np.zeros((param.nSpec, param.nGLL))
-        self.mu = np.zeros((param.nSpec, param.nGLL))
-        self.ticks = np.zeros(param.nSpec + 1)
 
         if param.gridType == 'homogeneous':
-            self.ticks = np.linspace(0, param.length, param.nSpec + 1)
-            self.rho.fill(param.meanRho)
-            self.mu.fill(param.meanMu)
-
-            self.z[1:param.nGLJ] = functions.project_inverse(
-                param.ksiGLJ[1:param.nGLJ],
-                0,
-                self.ticks)
-
-            ksiGLL = param.ksiGLL[1:]
-            for i in range(param.nGLL, param.nGlob, param.N):
-                self.z[i:i + param.N] = functions.project_inverse(ksiGLL,
-                                                                  i // param.N,
-                                                                  self.ticks)
+            # Read-only (nSpec, nGLL) views of a single value: nothing is
+            # allocated. Use np.array(...) to get a writable copy.
+            shape = (param.nSpec, param.nGLL)
+            self.rho = np.broadcast_to(param.dtype(param.meanRho), shape)
+            self.mu = np.broadcast_to(param.dtype(param.meanMu), shape)
 
-            self.z[-1] = self.ticks[-1]
+            self.ticks, self.z = homogeneous_geometry(param)
 
         elif param.gridType == 'gradient':
             msg = "typeOfGrid == 'gradient' has not been implemented yet"
@@ -47,14 +52,19 @@ class OneDimensionalGrid(object):
             msg = "typeOfGrid == 'miscellaneous' has not been implemented yet"
             raise NotImplementedError(msg)
         elif param.gridType == 'file':
-            self.z, self.rho, self.mu = np.loadtxt(param.gridFile, unpack=True)
-            self.ticks = np.loadtxt(param.ticksFile)
+            self.z, self.rho, self.mu = np.loadtxt(param.gridFile,
+                                                   dtype=param.dtype,
+                                                   unpack=True)
+            self.ticks = np.loadtxt(param.ticksFile, dtype=param.dtype)
         else:
             raise ValueError('Unknown grid type: %s' % (param.gridType, ))
+        # Abscissa of the GLL (GLJ) points element by element (nSpec*(N+1)),
+        # gathered once from z instead of indexing through ibool each time
+        self.zElem = self.z[param.ibool]
         # Jacobians at the GLL (and GLJ for the first element in axisym)
         # points (arrays nSpec*(N+1) elements)
         self.dXdKsi = gll.jacobian(self.ticks, param)
-        self.dKsiDx = gll.jacobian_inverse(self.ticks, param)
+        self.dKsiDx = np.reciprocal(self.dXdKsi)
 
     def plot(self):
         """Plot the grid
@@ -66,13 +76,13 @@ class OneDimensionalGrid(object):
 
         fig, ax = plt.subplots(2, 1, sharex=True)
 
-        ax[0].plot(self.z[self.param.ibool].flat, self.rho.flat, 'b+')
+        ax[0].plot(self.zElem.flat, self.rho.flat, 'b+')
         ax[0].set_title(r'$\rho(z)$')
         ax[0].xaxis.set_minor_locator(FixedLocator(self.ticks))
         ax[0].xaxis.grid(True, which='minor', alpha=0.5)
         ax[0].yaxis.grid(True)
 
-        ax[1].plot(self.z[self.param.ibool].flat, self.mu.flat, 'r+')
+        ax[1].plot(self.zElem.flat, self.mu.flat, 'r+')
         ax[1].set_title(r'$\mu(z)$')
         ax[1].xaxis.set_minor_locator(FixedLocator(self.ticks))
         ax[1].xaxis.grid(True, which='minor', alpha=0.5)
@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
 Created on Wed Nov 13 10:30:04 2013
@@ -18,8 +18,6 @@ Modified on Wed Apr 6 14:52 2016
 @author: Zeming Su, Xi'an Jiaotong University, China (suzeming1992@gmail.com)
 """
 
-from __future__ import (absolute_import, division, print_function)
-
 import numpy as np
 
 from config import Parameter
@@ -46,7 +44,7 @@ Ke = functions.make_stiffness_matrix(grid, param)
 M = functions.make_mass_matrix(grid, param)
 
 # Time integration
-u = np.zeros(param.nGlob)
+u = np.zeros(param.nGlob, dtype=param.dtype)
 vel = np.zeros_like(u)
 acc = np.zeros_like(u)
 
@@ -54,7 +52,6 @@ if param.plot:
     import matplotlib.pyplot as plt
     plt.ion()
     fig = plt.figure()
-    plt.hold(False)
 
 if param.axisym and (param.plot or param.snapshot):
     cz = np.concatenate((-grid.z[:0:-1], grid.z))
@@ -67,33 +64,39 @@ if param.boundType == 'ABC':
         staInx = 1
     if param.iSource < param.nGlob-param.N:
         endInx = -1
+# Loop invariants
+dt = param.dt
+dt2 = dt**2 / 2
+ibool = param.ibool
+abcCoef = (param.cfl*param.dh-param.dh)/(param.cfl*param.dh+param.dh)
 # Main time loop :
 for it in range(param.nts):
-    print('it = %d (t = %f s)' % (it, it * param.dt))
+    print('it = %d (t = %f s)' % (it, it * dt))
     if it > 0:
         if param.boundType == 'ABC':
-            u[staInx:endInx] += param.dt * vel[staInx:endInx] + acc[staInx:endInx] * param.dt**2 / 2
-            vel += param.dt / 2 * acc
+            u[staInx:endInx] += dt * vel[staInx:endInx] + acc[staInx:endInx] * dt2
+            vel += dt / 2 * acc
             acc.fill(0)
         elif param.boundType == 'NONE':
-            u += param.dt * vel + acc * param.dt**2 / 2
-            vel += param.dt / 2 * acc
+            u += dt * vel + acc * dt2
+            vel += dt / 2 * acc
             acc.fill(0)
         else:
              raise ValueError('Unknown type of boundary conditon.')
 
     for e in range(param.nSpec):
-        acc[param.ibool[e, :]] -= np.dot(Ke[e, :, :], u[param.ibool[e, :]])
+        iboolE = ibool[e, :]
+        acc[iboolE] -= np.dot(Ke[e, :, :], u[iboolE])
 
-    acc[param.iSource] += source[it*param.dt]
+    acc[param.iSource] += source[it*dt]
     acc /= M
-    vel += param.dt / 2 * acc
+    vel += dt / 2 * acc
     # process ABC boundary condition
     if param.boundType == 'ABC' :
         if staInx == 1:
-            u[0] = u[1] + (param.cfl*param.dh-param.dh)/(param.cfl*param.dh+param.dh) * (u[1]-u[0])
+            u[0] = u[1] + abcCoef * (u[1]-u[0])
         if endInx == -1:
-            u[-1] = u[-2] + (param.cfl*param.dh-param.dh)/(param.cfl*param.dh+param.dh) * (u[-2]-u[-1])
+            u[-1] = u[-2] + abcCoef * (u[-2]-u[-1])
 
     if param.snapshot and (it % param.snapshot == 0 or it == param.nts - 1):
         name = 'snapshot_forward_normal%05d' % (it, )
@@ -104,6 +107,7 @@ for it in range(param.nts):
             np.savetxt(name, np.column_stack((grid.z, u)))
 
     if param.plot and it % param.dplot == 0:
+        plt.cla()
         if param.axisym:
             c = np.concatenate((u[:0:-1], u))
             plt.plot(cz, c)
@@ -114,4 +118,4 @@ for it in range(param.nts):
             plt.plot(grid.z, u)
             # plt.ylim([-0.10, 0.10])
         plt.title("it : {}".format(it))
-        plt.draw()
+        plt.pause(0.001)